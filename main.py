@@ -3,12 +3,67 @@ from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 import astrbot.api.message_components as Comp
 import os
+import asyncio
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import shutil
-from datetime import datetime
+import time
 from pathlib import Path
 import json
+import functools
+import hashlib
+
+_TYPE_MAP = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+@functools.lru_cache(maxsize=1)
+def _load_schema() -> dict:
+    schema_path = Path(__file__).parent / "_conf_schema.json"
+    return json.loads(schema_path.read_text(encoding='utf-8'))
+
+# 所有ImageManager实例共享同一组日志队列处理器，按引用计数挂载/卸载
+_log_lock = threading.Lock()
+_log_refs = 0
+_log_handler = None
+_log_listener = None
+
+def _acquire_log_handler(target: logging.Logger):
+    global _log_refs, _log_handler, _log_listener
+    with _log_lock:
+        if _log_refs == 0:
+            file_handler = logging.FileHandler(
+                Path(__file__).parent / "WZL_NachonekoPlus.log",
+                encoding='utf-8'
+            )
+            file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+            # 文件写入交给后台线程，记录日志时只需入队，不阻塞指令处理
+            log_queue = queue.Queue(-1)
+            _log_handler = QueueHandler(log_queue)
+            _log_listener = QueueListener(log_queue, file_handler)
+            _log_listener.start()
+            target.addHandler(_log_handler)
+        _log_refs += 1
+
+def _release_log_handler(target: logging.Logger):
+    global _log_refs, _log_handler, _log_listener
+    with _log_lock:
+        _log_refs -= 1
+        if _log_refs > 0:
+            return
+        target.removeHandler(_log_handler)
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_handler = None
+        _log_listener = None
 
 class ImageManager:
     FOLDER_NAME = "WZL_NachonekoPlus"
@@ -16,18 +71,49 @@ class ImageManager:
     def __init__(self, config: dict):
         self.config = config
         self._init_logger()
-        self.storage_path = self._validate_storage_path()
-        self._verify_permissions()
+        try:
+            self.storage_path = self._validate_storage_path()
+            self._verify_permissions()
+        except Exception:
+            self._release_logger()
+            raise
+        self.session = self._init_session()
+        # 条件请求缓存：(上次响应的ETag, 对应的图片)，整体赋值保证线程间一致
+        self._etag_cache = None
+        self._prewarm_connection()
 
     def _init_logger(self):
         self.logger = logging.getLogger('WZLNekoPlugin')
         self.logger.setLevel(logging.INFO)
-        file_handler = logging.FileHandler(
-            Path(__file__).parent / "WZL_NachonekoPlus.log",
-            encoding='utf-8'
-        )
-        file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
-        self.logger.addHandler(file_handler)
+        _acquire_log_handler(self.logger)
+        self._log_attached = True
+
+    def _release_logger(self):
+        if self._log_attached:
+            self._log_attached = False
+            _release_log_handler(self.logger)
+
+    def _init_session(self) -> requests.Session:
+        # 复用连接池，避免每次请求重新建立TCP/TLS连接
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        # 图片本身已压缩，声明identity让服务端跳过压缩协商
+        session.headers.update({
+            'Accept': 'image/*',
+            'Accept-Encoding': 'identity',
+            'User-Agent': 'AstrBot-Nachoneko/1.0',
+        })
+        return session
+
+    def _prewarm_connection(self):
+        # 后台预先完成TLS握手，首次/neko时直接复用连接池中的连接
+        def warm():
+            try:
+                self.session.head('https://api.suyanw.cn/', timeout=5)
+            except requests.RequestException:
+                pass
+
+        threading.Thread(target=warm, name='WZLNekoPrewarm', daemon=True).start()
 
     def _validate_storage_path(self) -> Path:
         base_path = Path(self.config['storage_path']).resolve()
@@ -43,27 +129,95 @@ class ImageManager:
             self.logger.error(f"权限验证失败: {str(e)}")
             raise
 
-    def fetch_image(self) -> str:
+    @staticmethod
+    def _parse_extension(content_type: str) -> str:
+        mime = content_type.partition(';')[0].strip().lower()
+        return _TYPE_MAP.get(mime, 'jpg')
+
+    def _save_stream(self, resp: requests.Response, ext: str) -> Path:
+        # 边写临时文件边计算内容哈希，以哈希命名去重，再原子重命名避免残缺图片
+        part_path = self.storage_path / f"neko_{time.time_ns()}.part"
+        hasher = hashlib.blake2b(digest_size=8)
         try:
-            resp = requests.get('https://api.suyanw.cn/api/mao', timeout=15)
-            resp.raise_for_status()
-            
-            if 'image/' not in resp.headers.get('Content-Type', ''):
-                raise ValueError("非图片响应")
-            
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            ext = resp.headers['Content-Type'].split('/')[-1]
-            save_path = self.storage_path / f"neko_{timestamp}.{ext}"
-            
-            with open(save_path, 'wb') as f:
-                f.write(resp.content)
-                
-            self.logger.info(f"图片已保存: {save_path}")
-            return str(save_path)
-            
-        except Exception as e:
+            resp.raw.decode_content = True
+            with open(part_path, 'wb') as f:
+                while chunk := resp.raw.read(64 * 1024):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                save_path = self.storage_path / f"neko_{hasher.hexdigest()}.{ext}"
+                duplicate = save_path.exists()
+                if not duplicate:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if duplicate:
+                part_path.unlink()
+            else:
+                os.replace(part_path, save_path)
+            return save_path
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+
+    def _valid_etag_cache(self) -> tuple[str, str | bytes] | None:
+        cache = self._etag_cache
+        if cache and isinstance(cache[1], str) and not os.path.exists(cache[1]):
+            return None
+        return cache
+
+    def fetch_image(self) -> str | bytes | None:
+        """永久保存模式返回图片路径，否则直接返回图片数据"""
+        cache = self._valid_etag_cache()
+        headers = {'If-None-Match': cache[0]} if cache else {}
+        try:
+            with self.session.get(
+                'https://api.suyanw.cn/api/mao',
+                headers=headers,
+                timeout=15,
+                stream=True
+            ) as resp:
+                if cache and resp.status_code == 304:
+                    self.logger.info("图片未变化，复用上次结果")
+                    return cache[1]
+
+                resp.raise_for_status()
+
+                if 'image/' not in resp.headers.get('Content-Type', ''):
+                    raise ValueError("非图片响应")
+
+                # 非永久模式无需落盘，直接交给消息组件
+                if not self.config['keep_images']:
+                    image = resp.content
+                    self.logger.info(f"图片已获取: {len(image)} 字节")
+                else:
+                    ext = self._parse_extension(resp.headers['Content-Type'])
+                    save_path = self._save_stream(resp, ext)
+                    image = str(save_path)
+                    self.logger.info(f"图片已保存: {save_path}")
+
+                # 无ETag时不保留图片，避免常驻内存
+                etag = resp.headers.get('ETag')
+                self._etag_cache = (etag, image) if etag else None
+                return image
+
+        except requests.Timeout:
+            self.logger.warning("获取失败: 请求超时")
+            return None
+        except requests.ConnectionError as e:
+            self.logger.warning(f"获取失败: 连接错误 {str(e)}")
+            return None
+        except (requests.HTTPError, ValueError) as e:
             self.logger.error(f"获取失败: {str(e)}")
             return None
+        except (FileNotFoundError, PermissionError) as e:
+            self.logger.error(f"图片保存失败: {e.filename}")
+            return None
+        except Exception as e:
+            self.logger.error(f"获取失败: {str(e)}", exc_info=True)
+            return None
+
+    def close(self):
+        self.session.close()
+        self._release_logger()
 
 @register("astrbot_plugin_WZL_NachonekoPlus", "WZL", "甘城猫猫图片插件", "1.0.6", "https://github.com/WZL0813/astrbot_plugin_WZL_NachonekoPlus")
 class NachonekoPlugin(Star):
@@ -73,10 +227,7 @@ class NachonekoPlugin(Star):
         self.manager = ImageManager(self.config)
 
     def _load_config(self) -> dict:
-        config_path = Path(__file__).parent / "_conf_schema.json"
-        with open(config_path, 'r', encoding='utf-8') as f:
-            schema = json.load(f)
-            
+        schema = _load_schema()
         user_config = getattr(self.context, 'plugin_config', {})
         config = {}
         
@@ -99,19 +250,17 @@ class NachonekoPlugin(Star):
             # 第一阶段：立即回复文本
             yield event.plain_result("喵喵喵~")
             
-            # 第二阶段：获取并发送图片
-            img_path = self.manager.fetch_image()
-            if not img_path:
+            # 第二阶段：获取并发送图片（在线程中执行，避免阻塞事件循环）
+            image = await asyncio.to_thread(self.manager.fetch_image)
+            if not image:
                 yield event.plain_result("暂时无法获取图片，请稍后再试")
                 return
-                
-            yield event.chain_result([Comp.Image.fromFileSystem(img_path)])
-            
-            # 第三阶段：非永久模式清理
-            if not self.config['keep_images']:
-                os.remove(img_path)
-                self.manager.logger.info(f"临时图片已删除: {img_path}")
-                
+
+            if isinstance(image, bytes):
+                yield event.chain_result([Comp.Image.fromBytes(image)])
+            else:
+                yield event.chain_result([Comp.Image.fromFileSystem(image)])
+
         except requests.Timeout:
             yield event.plain_result("请求超时，猫猫正在偷懒~")
         except Exception as e:
@@ -119,5 +268,6 @@ class NachonekoPlugin(Star):
             yield event.plain_result("服务异常，快去找管理员修喵！")
 
     async def terminate(self):
+        self.manager.close()
         if not self.config['keep_images']:
             shutil.rmtree(self.manager.storage_path, ignore_errors=True)